@@ -0,0 +1,558 @@
+# coding: utf-8
+"""
+Audio feature module: extraction of the audio features, the memory-mapped
+feature cache and the audio field of the audio datasets
+"""
+import os
+import os.path
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from itertools import islice
+from typing import Iterable, List, Optional, Union
+
+import numpy as np
+import torch
+from torch.nn.utils.rnn import pad_sequence
+from torch.utils.data import get_worker_info
+from torchtext import data
+
+
+def _scale_features(featuresT: np.ndarray, scale: Optional[str]) \
+        -> np.ndarray:
+    """
+    Scale the features (frames x num) of a single audio file.
+
+    :param featuresT: extracted features
+    :param scale: scaling of the features ("norm", "mean", "unit_var", "all")
+    :return: scaled features
+    """
+    # imported here, text-only training doesn't need librosa and sklearn
+    import librosa
+    from sklearn import preprocessing
+    if scale == "norm" :
+        # normalize coefficients column-wise for each example normalizes (each column by aggregating over the rows)
+        featuresNorm = librosa.util.normalize(featuresT) # the input array is scaled to the norm between -1 and 1
+    elif scale == "mean" :
+        featuresT = preprocessing.scale(featuresT, with_std=False) # center to the mean
+    elif scale == "unit_var" :
+        featuresT = preprocessing.scale(featuresT, with_mean=False) # component-wise scale to unit variance
+    elif scale == "all" :
+        featuresT = preprocessing.scale(featuresT) # center to the mean and component-wise scale to unit variance
+    elif scale == "mono" :
+        # scaling of the MonoAudioDataset: normalized and scaled down
+        featuresT = librosa.util.normalize(featuresT) * 0.01
+    return featuresT
+
+
+def _is_empty_audio(audio_line: str) -> bool:
+    """
+    Check with a single stat, before decoding, whether an audio file is
+    missing from the list or holds no more than a WAV header (44 bytes).
+
+    :param audio_line: path to the audio file
+    :return: True if there is no audio to decode
+    """
+    return audio_line == '' or os.stat(audio_line).st_size <= 44
+
+
+_TORCHAUDIO_TRANSFORMS = {}
+
+
+def _torchaudio_transform(sr: int, num: int, audio_level: str, htk: bool,
+                          device: str) \
+        -> (torch.Tensor, torch.Tensor, Optional[torch.Tensor]):
+    """
+    Get the STFT window, the mel filterbank and the DCT matrix of the
+    torchaudio extraction, built once per sample rate and device. The
+    filterbank is the one of the librosa extraction (`librosa.filters.mel`,
+    Slaney-normalized, `htk` selects the mel scale).
+
+    Only functions of torchaudio 0.7 are used, the version matching torch 1.7
+    and the legacy torchtext API (the mel scale and centering options of the
+    torchaudio transforms need torchaudio >= 0.9).
+
+    :return: window (n_fft), mel filterbank (mels x frequencies) and DCT
+        matrix (mels x num, None for mel filterbanks)
+    """
+    key = (sr, num, audio_level, htk, device)
+    if key not in _TORCHAUDIO_TRANSFORMS:
+        import librosa
+        import torchaudio
+        n_fft = int(sr/40)
+        n_mels = num if audio_level == "mel_fb" else 80
+        mel_fb = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels,
+                                     htk=htk)
+        mel_fb = torch.from_numpy(np.ascontiguousarray(mel_fb,
+                                                       dtype=np.float32))
+        dct_mat = None if audio_level == "mel_fb" \
+            else torchaudio.functional.create_dct(num, n_mels, "ortho")
+        _TORCHAUDIO_TRANSFORMS[key] = (
+            torch.hann_window(n_fft, device=device), mel_fb.to(device),
+            dct_mat.to(device) if dct_mat is not None else None)
+    return _TORCHAUDIO_TRANSFORMS[key]
+
+
+@lru_cache(maxsize=None)
+def _torchaudio_resampler(orig_freq: int, new_freq: int) -> torch.nn.Module:
+    """
+    Resampling transform of torchaudio, built once per pair of rates
+    (`torchaudio.transforms.Resample` exists in torchaudio 0.7, unlike
+    `torchaudio.functional.resample`).
+
+    :param orig_freq: sample rate of the audio file
+    :param new_freq: sample rate to resample to
+    :return: resampling transform
+    """
+    import torchaudio
+    return torchaudio.transforms.Resample(orig_freq, new_freq)
+
+
+def extract_audio_features(audio_line: str, num: int, audio_level: str,
+                           htk: bool, scale: Optional[str],
+                           backend: str = "librosa", device: str = "cpu",
+                           sample_rate: Optional[int] = None) \
+        -> Optional[np.ndarray]:
+    """
+    Extract the features of a single audio file.
+
+    :param audio_line: path to the audio file
+    :param num: number of features to extract
+    :param audio_level: "mel_fb" for mel filterbanks, otherwise mfccs
+    :param htk: use HTK formula instead of Slaney for mel filters
+    :param scale: scaling of the features ("norm", "mean", "unit_var", "all")
+    :param backend: "librosa" or "torchaudio" (FFTs in torch, also on GPU)
+    :param device: device for the torchaudio transforms
+    :param sample_rate: resample the audio to this rate, None keeps the
+        native sample rate of the file
+    :return: features (frames x num) or None if the file is empty
+    """
+    if backend == "torchaudio":
+        return extract_audio_features_batch([audio_line], num, audio_level,
+                                            htk, scale, device,
+                                            sample_rate)[0]
+    if _is_empty_audio(audio_line):
+        return None
+    import librosa
+    y, sr = librosa.load(audio_line, sr=sample_rate)
+    # overwrite default values for the window width of 25 ms and stride of 10 ms (for sr = 16kHz)
+    # (n_fft : length of the FFT window, hop_length : number of samples between successive frames)
+    # default values: n_fft=2048, hop_length=512, n_mels=128, htk=False
+    # check which audio features should be extracted, default are mfccs
+    if audio_level == "mel_fb" :
+        features = librosa.feature.melspectrogram(y=y, sr=sr, n_fft=int(sr/40), hop_length=int(sr/100), n_mels=num, htk=htk)
+    else :
+        features = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=num, n_fft=int(sr/40), hop_length=int(sr/100), n_mels=80, htk=htk)
+    featuresT = features.T
+    return _scale_features(featuresT, scale).astype(np.float32)
+
+
+def extract_audio_features_batch(audio_lines: List[str], num: int,
+                                 audio_level: str, htk: bool,
+                                 scale: Optional[str], device: str = "cpu",
+                                 sample_rate: Optional[int] = None) \
+        -> List[Optional[np.ndarray]]:
+    """
+    Extract the features of several audio files with torchaudio. Every file
+    is decoded once, the waveforms with the same sample rate are padded and
+    their (mel) spectrograms are computed in one batch with `torch.stft`.
+
+    The features of a file don't depend on the other files of the batch:
+    each waveform is centered with its own reflection padding before the
+    zero padding of the batch, the spectrogram is cut back to the frames of
+    the file, and the dB scaling (clamped relative to the maximum, top_db)
+    and the DCT of the mfccs are applied per file.
+
+    :param audio_lines: paths to the audio files
+    :param num: number of features to extract
+    :param audio_level: "mel_fb" for mel filterbanks, otherwise mfccs
+    :param htk: use HTK formula instead of Slaney for mel filters
+    :param scale: scaling of the features ("norm", "mean", "unit_var", "all")
+    :param device: device for the torchaudio transforms
+    :param sample_rate: resample the audio to this rate, None keeps the
+        native sample rate of each file
+    :return: features (frames x num) per file, None for empty files
+    """
+    import torchaudio
+    results = [None] * len(audio_lines)
+    waves_by_sr = {}
+    for i, audio_line in enumerate(audio_lines):
+        if _is_empty_audio(audio_line):
+            continue
+        sound, sr = torchaudio.load(audio_line)
+        if sample_rate is not None and sr != sample_rate:
+            sound = _torchaudio_resampler(sr, sample_rate)(sound)
+            sr = sample_rate
+        # average the channels like librosa.load
+        waves_by_sr.setdefault(sr, []).append((i, sound.mean(dim=0)))
+
+    for sr, waves in waves_by_sr.items():
+        window, mel_fb, dct_mat = _torchaudio_transform(sr, num, audio_level,
+                                                        htk, device)
+        n_fft, hop_length = int(sr/40), int(sr/100)
+        with torch.no_grad():
+            # centering like torch.stft(center=True), but per file
+            batch = pad_sequence(
+                [torch.nn.functional.pad(
+                    wave.to(device).view(1, 1, -1),
+                    (n_fft // 2, n_fft // 2), mode="reflect").view(-1)
+                 for _, wave in waves], batch_first=True)
+            spectrograms = torch.stft(batch, n_fft, hop_length=hop_length,
+                                      window=window, center=False,
+                                      return_complex=True)
+            # power spectrograms (batch x frequencies x frames) to mels
+            mel_spectrograms = torch.matmul(
+                mel_fb, torch.view_as_real(spectrograms).pow(2).sum(-1))
+            for (i, wave), mel_spectrogram in zip(waves, mel_spectrograms):
+                # number of frames of the centered waveform of the file
+                frames = (wave.shape[0] + 2 * (n_fft // 2) - n_fft) \
+                    // hop_length + 1
+                featuresT = mel_spectrogram[:, :frames].t()
+                if dct_mat is not None:
+                    # power to dB like librosa.power_to_db(top_db=80)
+                    featuresT = torch.matmul(
+                        torchaudio.functional.amplitude_to_DB(
+                            featuresT, 10., 1e-10, 0., top_db=80.),
+                        dct_mat)
+                featuresT = featuresT.cpu().numpy()
+                results[i] = _scale_features(featuresT, scale) \
+                    .astype(np.float32)
+    return results
+
+
+def _iter_audio_features(audio_lines: Iterable[str], num: int,
+                         audio_level: str, htk: bool, scale: Optional[str],
+                         backend: str, device: str, batch_size: int = 64,
+                         num_workers: Optional[int] = None,
+                         sample_rate: Optional[int] = None) \
+        -> Iterable[Optional[np.ndarray]]:
+    """
+    Yield the features of every audio file in `audio_lines` in order,
+    torchaudio extracts `batch_size` files at once, librosa runs in
+    `num_workers` processes (default: number of CPUs).
+    """
+    if backend == "torchaudio":
+        while True:
+            chunk = list(islice(audio_lines, batch_size))
+            if not chunk:
+                break
+            yield from extract_audio_features_batch(chunk, num, audio_level,
+                                                    htk, scale, device,
+                                                    sample_rate)
+    elif num_workers is not None and num_workers <= 1:
+        for audio_line in audio_lines:
+            yield extract_audio_features(audio_line, num, audio_level, htk,
+                                         scale, sample_rate=sample_rate)
+    else:
+        extract = partial(extract_audio_features, num=num,
+                          audio_level=audio_level, htk=htk, scale=scale,
+                          sample_rate=sample_rate)
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            yield from executor.map(extract, audio_lines, chunksize=32)
+
+
+def audio_cache_paths(path: str, audio_ext: str, num: int, audio_level: str,
+                      htk: bool, scale: Optional[str],
+                      backend: str = "librosa", dtype: str = "float32",
+                      sample_rate: Optional[int] = None,
+                      cache_dir: Optional[str] = None) -> (str, str):
+    """
+    Paths of the feature cache for an audio file list. The extraction
+    settings are part of the name, so changing them creates a new cache.
+
+    :param cache_dir: directory of the cache, default: next to the audio
+        file list (the name of the audio file list is kept, so lists with the
+        same name need different directories)
+    :return: path to the features and path to the offsets
+    """
+    audio_path = os.path.expanduser(path + audio_ext)
+    if cache_dir is not None:
+        audio_path = os.path.join(os.path.expanduser(cache_dir),
+                                  os.path.basename(audio_path))
+    prefix = "{}.{}_{}".format(audio_path, audio_level, num)
+    if htk:
+        prefix += "_htk"
+    if scale is not None:
+        prefix += "_" + str(scale)
+    if backend != "librosa":
+        prefix += "_" + backend
+    if dtype != "float32":
+        prefix += "_" + dtype
+    if sample_rate is not None:
+        prefix += "_{}hz".format(sample_rate)
+    return prefix + ".features.npy", prefix + ".offsets.npy"
+
+
+def _count_lines(path: str) -> int:
+    """
+    Count the lines of a file by scanning its memory-mapped bytes, without
+    decoding it into strings.
+
+    :param path: path to the file
+    :return: number of lines (a last line without newline counts)
+    """
+    with open(path, "rb") as opened_file:
+        if os.fstat(opened_file.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(opened_file.fileno(), 0,
+                       access=mmap.ACCESS_READ) as mapped:
+            chunk = 1 << 20
+            lines = sum(mapped[start:start + chunk].count(b"\n")
+                        for start in range(0, len(mapped), chunk))
+            if mapped[-1:] != b"\n":
+                lines += 1
+    return lines
+
+
+# fixed size of the .npy header of the cache, large enough for any shape, so
+# the header can be written before the number of frames is known
+_NPY_HEADER_SIZE = 128
+
+
+def _write_npy_header(npy_file, dtype: str, shape: tuple) -> None:
+    """
+    Write a .npy (version 1.0) header of `_NPY_HEADER_SIZE` bytes at the
+    current position of `npy_file`, the array data has to follow in C order.
+
+    :param npy_file: file opened in binary mode
+    :param dtype: type of the array
+    :param shape: shape of the array
+    """
+    header = "{{'descr': {!r}, 'fortran_order': False, 'shape': {!r}, }}" \
+        .format(np.lib.format.dtype_to_descr(np.dtype(dtype)), tuple(shape))
+    # magic string, version 1.0, header length, header padded to a newline
+    header_len = _NPY_HEADER_SIZE - 10
+    assert len(header) < header_len
+    npy_file.write(b"\x93NUMPY\x01\x00")
+    npy_file.write(np.array(header_len, dtype="<u2").tobytes())
+    npy_file.write(header.ljust(header_len - 1).encode("latin1") + b"\n")
+
+
+def prepare_audio_cache(path: str, audio_ext: str, num: int, audio_level: str,
+                        htk: bool, scale: Optional[str],
+                        backend: str = "librosa", device: str = "cpu",
+                        num_workers: Optional[int] = None,
+                        dtype: str = "float32",
+                        sample_rate: Optional[int] = None,
+                        cache_dir: Optional[str] = None) -> (str, str):
+    """
+    Extract the features of all audio files listed in `path + audio_ext` once
+    and store them on disk. All features are concatenated into a single
+    `features.npy` (total_frames x num) that can be memory-mapped, the
+    `offsets.npy` index holds (start, length) per line of the audio file list.
+    Empty audio files get length 0.
+
+    The cache is reused as long as it is newer than the audio file list.
+
+    :param path: prefix of path to the data files
+    :param audio_ext: extension of the audio file list
+    :param num: number of features to extract
+    :param audio_level: "mel_fb" for mel filterbanks, otherwise mfccs
+    :param htk: use HTK formula instead of Slaney for mel filters
+    :param scale: scaling of the features
+    :param backend: "librosa" or "torchaudio"
+    :param device: device for the torchaudio transforms
+    :param num_workers: number of processes for the librosa extraction,
+        default: number of CPUs
+    :param dtype: storage type of the features, e.g. "float16" halves the
+        size of the cache (values are clipped to the range of the type)
+    :param sample_rate: resample the audio to this rate before the
+        extraction, None keeps the native sample rate of each file
+    :param cache_dir: directory of the cache, default: next to the audio
+        file list
+    :return: path to the features and path to the offsets
+    """
+    audio_path = os.path.expanduser(path + audio_ext)
+    features_path, offsets_path = audio_cache_paths(
+        path, audio_ext, num, audio_level, htk, scale, backend, dtype,
+        sample_rate, cache_dir)
+    if os.path.isfile(features_path) and os.path.isfile(offsets_path) and \
+            os.path.getmtime(offsets_path) >= os.path.getmtime(audio_path):
+        return features_path, offsets_path
+    if cache_dir is not None:
+        os.makedirs(os.path.expanduser(cache_dir), exist_ok=True)
+
+    # the features are appended to the .npy file as they are extracted, its
+    # header gets the number of frames at the end, the file is renamed once
+    # it is complete
+    tmp_path = features_path + ".tmp"
+    dtype_info = np.finfo(dtype)
+
+    # repeated audio files (e.g. in augmented data) are extracted only once
+    # and share their features in the cache
+    line_index = np.empty(_count_lines(audio_path), dtype=np.int64)
+    unique_index = {}
+    unique_lines = []
+    with open(audio_path, newline="\n") as audio_file:
+        for line_no, audio_line in enumerate(audio_file):
+            audio_line = audio_line.strip()
+            if audio_line not in unique_index:
+                unique_index[audio_line] = len(unique_lines)
+                unique_lines.append(audio_line)
+            line_index[line_no] = unique_index[audio_line]
+
+    unique_offsets = []
+    total = 0
+    with open(tmp_path, "wb") as npy_file:
+        _write_npy_header(npy_file, dtype, (0, num))
+        for features in _iter_audio_features(iter(unique_lines), num,
+                                             audio_level, htk, scale, backend,
+                                             device, num_workers=num_workers,
+                                             sample_rate=sample_rate):
+            if features is None:
+                unique_offsets.append((total, 0))
+                continue
+            if dtype != "float32":
+                features = np.clip(features, dtype_info.min, dtype_info.max)
+            npy_file.write(np.ascontiguousarray(features, dtype=dtype)
+                           .tobytes())
+            unique_offsets.append((total, features.shape[0]))
+            total += features.shape[0]
+        npy_file.seek(0)
+        _write_npy_header(npy_file, dtype, (total, num))
+    os.replace(tmp_path, features_path)
+    unique_offsets = np.array(unique_offsets, dtype=np.int64).reshape(-1, 2)
+    np.save(offsets_path, unique_offsets[line_index])
+    return features_path, offsets_path
+
+
+def _load_cached_features(features: Union[np.ndarray, torch.Tensor],
+                          batch: List[tuple]) -> torch.Tensor:
+    """
+    Read the cached features for a batch of (start, length), padded with
+    zeros to the longest example. The slices of the memory-mapped features
+    are not copied before padding.
+
+    With pinned features (see `_pin_features`), the batch is padded directly
+    into pinned memory in the main process, so it doesn't need to be pinned
+    again before the copy to the GPU.
+
+    :param features: memory-mapped or pinned features of a dataset
+    :param batch: (start, length) of the examples in `features`
+    :return: features (batch x frames x num)
+    """
+    if not isinstance(features, torch.Tensor):
+        return pad_sequence([torch.from_numpy(features[start:start + length])
+                             for start, length in batch], batch_first=True)
+    if get_worker_info() is not None:
+        # no page-locked allocations in (forked) worker processes
+        return pad_sequence([features[start:start + length]
+                             for start, length in batch], batch_first=True)
+    padded = torch.zeros(len(batch), max(length for _, length in batch),
+                         features.size(1), dtype=features.dtype,
+                         pin_memory=True)
+    for i, (start, length) in enumerate(batch):
+        padded[i, :length] = features[start:start + length]
+    return padded
+
+
+def _pin_features(features: np.ndarray) -> torch.Tensor:
+    """
+    Copy the memory-mapped features of a dataset into a single pinned
+    (page-locked) tensor, allocated once for the whole dataset. The copy is
+    done in chunks, the pages of the cache file are only read once.
+
+    :param features: memory-mapped features (total_frames x num)
+    :return: pinned features
+    """
+    dtype = torch.from_numpy(np.empty(0, dtype=features.dtype)).dtype
+    pinned = torch.empty(features.shape, dtype=dtype, pin_memory=True)
+    pinned_array = pinned.numpy()
+    chunk = 1 << 16
+    for start in range(0, features.shape[0], chunk):
+        pinned_array[start:start + chunk] = features[start:start + chunk]
+    return pinned
+
+
+def _audio_frames(audio_line: str, sample_rate: Optional[int] = None) -> int:
+    """
+    Number of feature frames (stride of 10 ms) of an audio file, read from
+    its header with soundfile (a dependency of librosa) without decoding the
+    audio, for both feature backends (`torchaudio.info` only gives the
+    number of samples from torchaudio 0.8 on).
+
+    :param audio_line: path to the audio file
+    :param sample_rate: rate the audio is resampled to, None: native rate
+    :return: number of frames, 0 for empty files
+    """
+    if _is_empty_audio(audio_line):
+        return 0
+    import soundfile
+    info = soundfile.info(audio_line)
+    samples, sr = info.frames, info.samplerate
+    if sample_rate is not None and sample_rate != sr:
+        samples = int(np.ceil(samples * sample_rate / sr))
+        sr = sample_rate
+    n_fft, hop_length = int(sr/40), int(sr/100)
+    # centered frames (reflect padding of n_fft // 2 on both sides)
+    return (samples + 2 * (n_fft // 2) - n_fft) // hop_length + 1
+
+
+def _extract_batch_features(num: int, audio_level: str, htk: bool,
+                            scale: Optional[str], backend: str,
+                            sample_rate: Optional[int], batch: List[str]) \
+        -> torch.Tensor:
+    """
+    Extract the features of a batch of audio files on the fly, padded with
+    zeros to the longest example. Used instead of the feature cache, it runs
+    in the DataLoader worker processes (on cpu) if there are any.
+
+    :param batch: paths to the audio files of the examples
+    :return: features (batch x frames x num)
+    """
+    features = _iter_audio_features(iter(batch), num, audio_level, htk, scale,
+                                    backend, "cpu", batch_size=len(batch),
+                                    num_workers=1, sample_rate=sample_rate)
+    return pad_sequence([torch.from_numpy(feats) for feats in features],
+                        batch_first=True)
+
+
+def audio_field_entries(path: str, audio_ext: str, num: int,
+                         audio_level: str, htk: bool, scale: Optional[str],
+                         backend: str, device: str, dtype: str,
+                         sample_rate: Optional[int],
+                         num_workers: Optional[int], cache: bool,
+                         pin_features: bool = False,
+                         cache_dir: Optional[str] = None) \
+        -> (Union[np.ndarray, torch.Tensor, None], data.RawField,
+            List[tuple]):
+    """
+    Prepare the audio side of a dataset. With `cache`, the features are
+    extracted once into the memory-mapped cache (see `prepare_audio_cache`)
+    and the examples hold their (start, length) in it. Without, the examples
+    hold the path to their audio file and the audio field extracts the
+    features of each batch when it is created. With `pin_features`, the
+    cached features are loaded into one pinned tensor (needs CUDA and
+    enough RAM for the whole cache), only useful if the batches are built
+    in the main process (DataLoader without workers). `cache_dir` places the
+    cache in another directory than the audio file list (e.g. for read-only
+    corpora).
+
+    :return: memory-mapped or pinned features (None without cache), audio
+        field and
+        (value for the audio field, number of frames) per audio list line
+    """
+    if cache:
+        features_path, offsets_path = prepare_audio_cache(
+            path, audio_ext, num, audio_level, htk, scale, backend, device,
+            dtype=dtype, sample_rate=sample_rate, num_workers=num_workers,
+            cache_dir=cache_dir)
+        # copy-on-write mapping: writable arrays for torch.from_numpy,
+        # the file is never changed
+        features = np.load(features_path, mmap_mode="c")
+        if pin_features and torch.cuda.is_available():
+            features = _pin_features(features)
+        audio_field = data.RawField(
+            postprocessing=partial(_load_cached_features, features))
+        entries = [((start, length), length)
+                   for start, length in np.load(offsets_path).tolist()]
+        return features, audio_field, entries
+
+    audio_field = data.RawField(
+        postprocessing=partial(_extract_batch_features, num, audio_level, htk,
+                               scale, backend, sample_rate))
+    with open(os.path.expanduser(path + audio_ext), newline="\n") \
+            as audio_file:
+        entries = [(audio_line, _audio_frames(audio_line, sample_rate))
+                   for audio_line in (line.strip() for line in audio_file)]
+    return None, audio_field, entries
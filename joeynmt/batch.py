@@ -1,7 +1,3 @@
-import numpy as np
-import torch
-import torch.nn as nn
-
 # coding: utf-8
 
 """
@@ -40,14 +36,8 @@ class Batch:
             self.conv_mask = (self.conv != pad_index).unsqueeze(-2)
 
         if hasattr(torch_batch, "mfcc"):
+            # already padded when the batch was loaded
             self.mfcc = torch_batch.mfcc
-            max_tensor = max(self.mfcc, key=lambda x: x.shape[0])
-            max_dim = max_tensor.shape[0]
-            padded_mfcc = []
-            for x in self.mfcc: 
-                m = nn.ZeroPad2d((0, 0, 0, max_dim-x.shape[0]))
-                padded_mfcc.append(m(x))
-            self.mfcc = torch.stack(padded_mfcc)
 
         if hasattr(torch_batch, "trg"):
             trg, trg_lengths = torch_batch.trg
@@ -63,26 +53,30 @@ class Batch:
         if use_cuda:
             self._make_cuda()
 
+        if hasattr(self, "mfcc"):
+            # features may be stored in half precision, the model needs float
+            self.mfcc = self.mfcc.float()
+
     def _make_cuda(self):
         """
         Move the batch to GPU
 
         :return:
         """
-        self.src = self.src.cuda()
-        self.src_mask = self.src_mask.cuda()
+        self.src = self.src.cuda(non_blocking=True)
+        self.src_mask = self.src_mask.cuda(non_blocking=True)
 
         if self.trg_input is not None:
-            self.trg_input = self.trg_input.cuda()
-            self.trg = self.trg.cuda()
-            self.trg_mask = self.trg_mask.cuda()
+            self.trg_input = self.trg_input.cuda(non_blocking=True)
+            self.trg = self.trg.cuda(non_blocking=True)
+            self.trg_mask = self.trg_mask.cuda(non_blocking=True)
 
         if hasattr(self, "mfcc"):
-            self.mfcc = self.mfcc.cuda()
+            self.mfcc = self.mfcc.cuda(non_blocking=True)
 
         if hasattr(self, "conv"):
-            self.conv = self.conv.cuda()
-            self.conv_mask = self.conv_mask.cuda()
+            self.conv = self.conv.cuda(non_blocking=True)
+            self.conv_mask = self.conv_mask.cuda(non_blocking=True)
 
     def sort_by_src_lengths(self):
         """
@@ -7,5 +7,7 @@ UNK_TOKEN = '<unk>'
 PAD_TOKEN = '<pad>'
 BOS_TOKEN = '<s>'
 EOS_TOKEN = '</s>'
+# token of the src/conv lines of audio data, one per audio frame
+DUMMY_TOKEN = 'a'
 
 DEFAULT_UNK_ID = lambda: 0
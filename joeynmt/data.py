@@ -5,19 +5,25 @@ Data module
 import sys
 import os
 import os.path
-import librosa
+import random
+import multiprocessing
+import numpy as np
 import torch
-import sklearn 
+from torch.utils.data import DataLoader, Sampler
 import warnings
+from functools import lru_cache, partial
+from itertools import zip_longest
 
-from typing import Optional
+from typing import List, Optional
 
 from torchtext.datasets import TranslationDataset
 from torchtext import data
-from torchtext.data import Dataset, Iterator, Field
+from torchtext.data import Dataset, Field
 
-from joeynmt.constants import UNK_TOKEN, EOS_TOKEN, BOS_TOKEN, PAD_TOKEN
+from joeynmt.constants import UNK_TOKEN, EOS_TOKEN, BOS_TOKEN, PAD_TOKEN, \
+    DUMMY_TOKEN
 from joeynmt.vocabulary import build_vocab, Vocabulary
+from joeynmt.audio import audio_field_entries
 
 
 def load_data(data_cfg: dict) -> (Dataset, Dataset, Optional[Dataset],
@@ -50,7 +56,8 @@ def load_data(data_cfg: dict) -> (Dataset, Dataset, Optional[Dataset],
     lowercase = data_cfg["lowercase"]
     max_sent_length = data_cfg["max_sent_length"]
 
-    tok_fun = lambda s: list(s) if level == "char" else s.split()
+    # builtins instead of lambdas: no extra Python call per line
+    tok_fun = list if level == "char" else str.split
 
     src_field = data.Field(init_token=None, eos_token=EOS_TOKEN,
                            pad_token=PAD_TOKEN, tokenize=tok_fun,
@@ -106,10 +113,124 @@ def load_data(data_cfg: dict) -> (Dataset, Dataset, Optional[Dataset],
     return train_data, dev_data, test_data, src_vocab, trg_vocab
 
 
+class TorchBatch(data.Batch):
+    """
+    torchtext batch that can be created in DataLoader workers and pinned.
+    """
+
+    def __init__(self, examples=None, dataset=None, device=None):
+        super(TorchBatch, self).__init__(examples, dataset, device)
+        # don't send the whole dataset back from the loader workers
+        self.dataset = None
+        self.fields = list(self.fields)
+
+    def pin_memory(self):
+        """
+        Pin the tensors of all fields, called by the DataLoader.
+
+        :return: the pinned batch
+        """
+        for name in self.fields:
+            value = getattr(self, name, None)
+            if isinstance(value, torch.Tensor):
+                setattr(self, name, value.pin_memory())
+            elif isinstance(value, tuple):
+                setattr(self, name, tuple(v.pin_memory() for v in value))
+        return self
+
+
+class LenBucketSampler(Sampler):
+    """
+    Batch sampler that groups examples of similar source length, the same
+    way as torchtext's BucketIterator: the (shuffled) examples are split
+    into pools of 100 batches, each pool is sorted by length and cut into
+    batches, and the batches of a pool are shuffled. Within a batch, the
+    examples are sorted by decreasing length.
+
+    The source lengths are taken from `dataset.lengths` if the dataset
+    provides them (audio datasets), otherwise from the examples.
+    """
+
+    def __init__(self, dataset: Dataset, batch_size: int,
+                 shuffle: bool = False) -> None:
+        """
+        :param dataset: torchtext dataset containing src
+        :param batch_size: number of examples per batch
+        :param shuffle: whether to shuffle the data before each epoch
+        """
+        # not getattr: torchtext datasets answer any attribute with a generator
+        lengths = vars(dataset).get("lengths")
+        if lengths is None:
+            lengths = [len(ex.src) for ex in dataset.examples]
+        self.lengths = np.asarray(lengths, dtype=np.int32)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        # own random state, like torchtext's RandomShuffler
+        self.random_state = random.getstate()
+
+    def _shuffle(self, items: list) -> list:
+        """ Shuffle with the sampler's own random state """
+        old_state = random.getstate()
+        random.setstate(self.random_state)
+        shuffled = random.sample(items, len(items))
+        self.random_state = random.getstate()
+        random.setstate(old_state)
+        return shuffled
+
+    def __iter__(self):
+        indices = list(range(len(self.lengths)))
+        if self.shuffle:
+            indices = self._shuffle(indices)
+        indices = np.array(indices, dtype=np.int64)
+        pool_size = self.batch_size * 100
+        batches = []
+        for pool_start in range(0, len(indices), pool_size):
+            pool = indices[pool_start:pool_start + pool_size]
+            pool = pool[np.argsort(self.lengths[pool], kind="stable")]
+            pool_batches = []
+            for start in range(0, len(pool), self.batch_size):
+                batch = pool[start:start + self.batch_size]
+                # stable sort by decreasing length
+                batch = batch[np.argsort(-self.lengths[batch], kind="stable")]
+                pool_batches.append(batch.tolist())
+            if self.shuffle:
+                pool_batches = self._shuffle(pool_batches)
+            batches.extend(pool_batches)
+        return iter(batches)
+
+    def __len__(self):
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size
+
+
+def loader_workers(num_workers: int) -> int:
+    """
+    Number of DataLoader worker processes usable on this platform. The
+    datasets can't be pickled (the vocabularies' defaultdict has a lambda
+    factory, torchtext's Dataset.__getattr__ breaks the __getstate__ lookup),
+    so workers need the fork start method. With another start method (spawn
+    on Windows and on macOS since Python 3.8), the batches are prepared in
+    the main process.
+
+    :param num_workers: configured number of worker processes
+    :return: number of worker processes to use
+    """
+    start_method = multiprocessing.get_start_method(allow_none=True) \
+        or multiprocessing.get_all_start_methods()[0]
+    if num_workers > 0 and start_method != "fork":
+        warnings.warn("num_workers is ignored since the datasets can't be "
+                      "sent to DataLoader workers started with {}, the "
+                      "batches are prepared in the main process."
+                      .format(start_method))
+        return 0
+    return num_workers
+
+
 def make_data_iter(dataset: Dataset, batch_size: int, train: bool = False,
-                   shuffle: bool = False) -> Iterator:
+                   shuffle: bool = False, num_workers: int = 0,
+                   pin_memory: bool = False, prefetch_factor: int = 2,
+                   persistent_workers: bool = False) -> DataLoader:
     """
-    Returns a torchtext iterator for a torchtext dataset.
+    Returns a DataLoader for a torchtext dataset, yielding torchtext batches.
 
     :param dataset: torchtext dataset containing src and optionally trg
     :param batch_size: size of the batches the iterator prepares
@@ -117,19 +238,31 @@ def make_data_iter(dataset: Dataset, batch_size: int, train: bool = False,
         bucketing, sorting within batches and shuffling is disabled
     :param shuffle: whether to shuffle the data before each epoch
         (no effect if set to True for testing)
-    :return: torchtext iterator
+    :param num_workers: number of processes that prepare the batches,
+        0 prepares them in the main process
+    :param pin_memory: pin the batches for faster copies to the GPU
+    :param prefetch_factor: number of batches loaded in advance by each
+        worker (only used with num_workers > 0)
+    :param persistent_workers: keep the worker processes alive between
+        epochs (only used with num_workers > 0)
+    :return: DataLoader over torchtext batches
     """
+    loader_kwargs = {"collate_fn": partial(TorchBatch, dataset=dataset),
+                     "num_workers": num_workers, "pin_memory": pin_memory}
+    # the DataLoader rejects these options without worker processes
+    if num_workers > 0:
+        loader_kwargs["prefetch_factor"] = prefetch_factor
+        loader_kwargs["persistent_workers"] = persistent_workers
     if train:
         # optionally shuffle and sort during training
-        data_iter = data.BucketIterator(
-            repeat=False, sort=False, dataset=dataset,
-            batch_size=batch_size, train=True, sort_within_batch=True,
-            sort_key=lambda x: len(x.src), shuffle=shuffle)
+        data_iter = DataLoader(
+            dataset, batch_sampler=LenBucketSampler(dataset, batch_size,
+                                                    shuffle=shuffle),
+            **loader_kwargs)
     else:
         # don't sort/shuffle for validation/inference
-        data_iter = data.Iterator(
-            repeat=False, dataset=dataset, batch_size=batch_size,
-            train=False, sort=False)
+        data_iter = DataLoader(dataset, batch_size=batch_size, shuffle=False,
+                               **loader_kwargs)
 
     return data_iter
 
@@ -159,13 +292,10 @@ class MonoDataset(Dataset):
             src_path = os.path.expanduser(path + ext)
             src_file = open(src_path)
 
-        examples = []
-        for src_line in src_file:
-            src_line = src_line.strip()
-            if src_line != '':
-                examples.append(data.Example.fromlist(
-                    [src_line], fields))
-
+        from_list = data.Example.fromlist
+        examples = [from_list([src_line], fields)
+                    for src_line in (line.strip() for line in src_file)
+                    if src_line != '']
         src_file.close()
 
         super(MonoDataset, self).__init__(examples, fields, **kwargs)
@@ -209,16 +339,32 @@ def load_audio_data(cfg: dict) -> (Dataset, Dataset, Optional[Dataset],
     assert number <= 80,\
     "The number of used audio features could not be higher than the number of Mel bands. Change the encoder's embedding_dim."
     check_ratio = data_cfg.get("input_length_ratio", sys.maxsize)
+    log_stats = data_cfg.get("log_length_stats", False)
     audio_features = data_cfg["audio_features_level"]
     htk = data_cfg["use_htk"]
     scale = data_cfg.get("scale", None)
+    backend = data_cfg.get("feature_backend", "librosa")
+    dtype = data_cfg.get("feature_dtype", "float32")
+    sample_rate = data_cfg.get("sample_rate", None)
+    feature_workers = data_cfg.get("feature_workers", None)
+    cache = data_cfg.get("feature_cache", True)
+    cache_dir = data_cfg.get("feature_cache_dir", None)
+    pin_features = data_cfg.get("pin_features", False)
+    # pinned batches are only built in the main process, the training batches
+    # from DataLoader workers would be copied and pinned again anyway
+    pin_train_features = pin_features \
+        and loader_workers(cfg["training"].get("num_workers", 0)) == 0
+    if pin_features and not pin_train_features:
+        warnings.warn("pin_features is ignored for the training data since "
+                      "its batches are built by DataLoader workers, set "
+                      "num_workers to 0 to use it.")
+    device = "cuda" if cfg["training"].get("use_cuda", False) else "cpu"
 
-    #pylint: disable=unnecessary-lambda
     if level == "char":
-        tok_fun = lambda s: list(s)
+        tok_fun = list
         char = True
     else:  # bpe or word, pre-tokenized
-        tok_fun = lambda s: s.split()
+        tok_fun = str.split
         char = False
 
     src_field = data.Field(init_token=None, eos_token=EOS_TOKEN,
@@ -237,9 +383,11 @@ def load_audio_data(cfg: dict) -> (Dataset, Dataset, Optional[Dataset],
                               audio_ext=".txt", sfield=src_field, tfield=trg_field, 
                               num=number, char_level=char, train=True,
                               check=check_ratio, audio_level=audio_features, htk=htk,
-                              scale=scale, filter_pred = lambda x:
-                              len(vars(x)['src']) <= max_audio_length
-                              and len(vars(x)['trg']) <= max_sent_length)
+                              scale=scale, backend=backend, device=device, dtype=dtype,
+                              sample_rate=sample_rate, num_workers=feature_workers, cache=cache,
+                              cache_dir=cache_dir, pin_features=pin_train_features,
+                              max_audio_length=max_audio_length,
+                              max_sent_length=max_sent_length, log_stats=log_stats)
 
     src_max_size = data_cfg.get("src_voc_limit", sys.maxsize)
     src_min_freq = data_cfg.get("src_voc_min_freq", 1)
@@ -247,16 +395,22 @@ def load_audio_data(cfg: dict) -> (Dataset, Dataset, Optional[Dataset],
     trg_min_freq = data_cfg.get("trg_voc_min_freq", 1)
 
     trg_vocab_file = data_cfg.get(audio_lang + "_vocab", None)
-    src_vocab_file = None
     trg_vocab = build_vocab(field="trg", min_freq=trg_min_freq, max_size=trg_max_size,
                             dataset=train_data, vocab_file=trg_vocab_file)
-    src_vocab = build_vocab(field="src", min_freq=src_min_freq, max_size=src_max_size,
-                            dataset=train_data, vocab_file=src_vocab_file)
+    # the src lines only consist of the dummy token, its frequency is the sum
+    # of the src lengths, no need to count all the tokens of the training set
+    src_vocab_tokens = [DUMMY_TOKEN] \
+        if int(train_data.lengths.sum()) >= src_min_freq else []
+    src_vocab = Vocabulary(tokens=src_vocab_tokens[:src_max_size])
     #src_vocab = trg_vocab
     dev_data = AudioDataset(path=dev_path, text_ext="." + audio_lang, audio_ext=".txt", 
                             sfield=src_field, tfield=trg_field, num=number,
                             char_level=char, train=False, check=check_ratio,
-                            audio_level=audio_features, htk=htk, scale=scale)
+                            audio_level=audio_features, htk=htk, scale=scale,
+                            backend=backend, device=device, dtype=dtype,
+                            sample_rate=sample_rate, num_workers=feature_workers,
+                            cache=cache, cache_dir=cache_dir,
+                            pin_features=pin_features)
     test_data = None
     if test_path is not None:
         # check if target exists
@@ -264,25 +418,70 @@ def load_audio_data(cfg: dict) -> (Dataset, Dataset, Optional[Dataset],
             test_data = AudioDataset(path=test_path, text_ext="." + audio_lang, 
                             audio_ext=".txt", sfield=src_field, tfield=trg_field, num=number,
                             char_level=char, train=False, check=check_ratio,
-                            audio_level=audio_features, htk=htk, scale=scale)
+                            audio_level=audio_features, htk=htk, scale=scale,
+                            backend=backend, device=device, dtype=dtype,
+                            sample_rate=sample_rate, num_workers=feature_workers,
+                            cache=cache, cache_dir=cache_dir,
+                            pin_features=pin_features)
         else:
             # no target is given -> create dataset from src only
             test_data = MonoAudioDataset(path=test_path, audio_ext=".txt", 
-                            field=src_field, num=number, char_level=char)
+                            field=src_field, num=number, char_level=char,
+                            backend=backend, device=device, dtype=dtype,
+                            sample_rate=sample_rate, num_workers=feature_workers,
+                            cache=cache, cache_dir=cache_dir,
+                            pin_features=pin_features)
     trg_field.vocab = trg_vocab
     src_field.vocab = src_vocab
 
     return train_data, dev_data, test_data, src_vocab, trg_vocab
 
 
+@lru_cache(maxsize=None)
+def _dummy_tokens(size: int) -> List[str]:
+    """
+    Line of `size` dummy tokens (mapped to their own id in the src
+    vocabulary of `load_audio_data`), shared by all examples of the same
+    length. Must not be modified.
+
+    :param size: number of tokens
+    :return: list of dummy tokens
+    """
+    return [DUMMY_TOKEN] * max(size, 0)
+
+
+def _set_dummy_lines(example: data.Example, length: int) -> data.Example:
+    """
+    Set the dummy src and conv lines of an audio example, their lengths
+    follow the number of audio frames (conv: after two strided convolutions).
+
+    :param example: example to set the lines for
+    :param length: number of audio frames
+    :return: the example
+    """
+    example.src = _dummy_tokens(length - 2)
+    example.conv = _dummy_tokens(int(round(round(length/2)/2) - 2))
+    return example
+
+
 class AudioDataset(TranslationDataset):
     """Defines a dataset for speech recognition/translation."""
 
     def __init__(self, path: str, text_ext: str, audio_ext: str, sfield: Field, tfield: Field, 
             num: int, char_level: bool, train: bool, check: int, audio_level: str, htk: bool,
-            scale: str, **kwargs) -> None:
+            scale: str, backend: str = "librosa", device: str = "cpu", dtype: str = "float32",
+            sample_rate: Optional[int] = None, num_workers: Optional[int] = None,
+            cache: bool = True, cache_dir: Optional[str] = None,
+            pin_features: bool = False, max_audio_length: int = sys.maxsize, max_sent_length: int = sys.maxsize,
+            log_stats: bool = False, **kwargs) -> None:
         """Create an AudioDataset given path and fields.
 
+        The audio features are extracted once into a memory-mapped cache
+        (see `prepare_audio_cache`), the examples only hold the
+        (start, length) of their features in this cache. Without cache, the
+        examples hold the path to their audio file and the features are
+        extracted per batch, in the DataLoader workers.
+
             :param path: Prefix of path to the data files
             :param text_ext: Containing the extension to path for text file
             :param audio_ext: Containing the extension to path for audio file
@@ -294,75 +493,68 @@ class AudioDataset(TranslationDataset):
             :param audio_level: Containing the extraction level of audio features extension
             :param htk: Containing the indicator for mel filters generation
             :param scale: Containing the indicator for audio features scaling
+            :param backend: Containing the library for the feature extraction ("librosa" or "torchaudio")
+            :param device: Containing the device for the torchaudio feature extraction
+            :param dtype: Containing the storage type of the cached features (e.g. "float16")
+            :param sample_rate: Containing the sample rate to resample the audio to (None: native rate)
+            :param num_workers: Containing the number of processes for the librosa feature extraction (None: number of CPUs)
+            :param cache: Containing the indicator for the feature cache, otherwise the features are extracted per batch
+            :param cache_dir: Containing the directory of the feature cache (None: next to the audio file list)
+            :param pin_features: Containing the indicator for loading the cached features into one pinned tensor (CUDA only, for batches built in the main process)
+            :param max_audio_length: Containing the maximum length of the (dummy) audio lines
+            :param max_sent_length: Containing the maximum number of text tokens
+            :param log_stats: Containing the indicator for appending the length ratio statistics of the training set to `path + '_length_statistics'`
             :param kwargs: Passed to the constructor of data.Dataset.
         """
-        audio_field = data.RawField()
+        self.features, audio_field, audio_entries = audio_field_entries(
+            path, audio_ext, num, audio_level, htk, scale, backend, device,
+            dtype, sample_rate, num_workers, cache, pin_features, cache_dir)
         all_fields = [('trg', tfield), ('mfcc', audio_field), ('src', sfield), ('conv', sfield)]
 
         text_path = os.path.expanduser(path + text_ext)
-        audio_path = os.path.expanduser(path + audio_ext)
-        examples = []
+        text_lines = []
+        audio_items = []
+        with open(text_path) as text_file:
+            for line_no, (text_line, audio_entry) in \
+                    enumerate(zip_longest(text_file, audio_entries)):
+                if text_line is None or audio_entry is None:
+                    raise IndexError('The size of the text and audio dataset differs.')
+                text_line = text_line.strip()
+                if text_line != '' and audio_entry[1] > 0 :
+                    text_lines.append(text_line)
+                    audio_items.append(audio_entry)
+                else : 
+                    warnings.warn('There is an empty text line or audio file.')
+                    print("Check the text line: ", text_line, " or audio file in line: ", line_no + 1)
+
+        # filter by length before any example is created,
+        # text lines are tokenized only once and passed as tokens
+        text_tokens = [tfield.tokenize(text_line) for text_line in text_lines]
+        lengths = np.array([length for _, length in audio_items], dtype=np.int64)
+        keep = (np.maximum(lengths - 2, 0) <= max_audio_length) \
+            & (np.array([len(tokens) for tokens in text_tokens], dtype=np.int64) <= max_sent_length)
         if train :
-            maxi = 1
-            mini = 10
-            summa = 0
-            count = 0
+            # length ratio of audio frames to text characters for all examples at once
+            text_lengths = np.array([len(text_line) for text_line in text_lines], dtype=np.int64)
+            length_ratios = lengths // (text_lengths + 1)
+            keep &= length_ratios < check
+
+        # the dummy src/conv lines are set directly, they don't need tokenization
+        example_fields = all_fields[:2]
+        from_list = data.Example.fromlist
+        examples = [_set_dummy_lines(from_list([tokens, audio], example_fields), length)
+                    for tokens, (audio, length), kept in zip(text_tokens, audio_items, keep.tolist())
+                    if kept]
+        # source lengths for bucketing (= length of the dummy src lines), without going through the examples
+        self.lengths = np.maximum(lengths[keep] - 2, 0).astype(np.int32)
+        if train and log_stats :
+            maxi = max(1, int(length_ratios.max()))
+            mini = min(10, int(length_ratios.min()))
+            summa = int(length_ratios.sum())
+            count = len(length_ratios)
             log_path = os.path.expanduser(path + '_length_statistics')
-            length_info = open(log_path, 'a')
-
-        if len(open(text_path).read().splitlines()) != len(open(audio_path).read().splitlines()):
-            raise IndexError('The size of the text and audio dataset differs.')
-        else:
-            with open(text_path) as text_file, open(audio_path) as audio_file:
-                for text_line, audio_line in zip(text_file, audio_file):
-                    text_line = text_line.strip()
-                    audio_line = audio_line.strip()
-                    if text_line != '' and audio_line != '' and os.path.getsize(audio_line) > 44 :
-                        y, sr = librosa.load(audio_line, sr=None)
-                        # overwrite default values for the window width of 25 ms and stride of 10 ms (for sr = 16kHz)
-                        # (n_fft : length of the FFT window, hop_length : number of samples between successive frames)
-                        # default values: n_fft=2048, hop_length=512, n_mels=128, htk=False
-                        # features = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=num)
-                        # check which audio features should be extracted, default are mfccs
-                        if audio_level == "mel_fb" :
-                            features = librosa.feature.melspectrogram(y=y, sr=sr, n_fft=int(sr/40), hop_length=int(sr/100), n_mels=num, htk=htk)
-                        else :
-                            features = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=num, n_fft=int(sr/40), hop_length=int(sr/100), n_mels=80, htk=htk)
-                        featuresT = features.T
-                        if scale == "norm" :
-                            # normalize coefficients column-wise for each example normalizes (each column by aggregating over the rows)
-                            featuresNorm = librosa.util.normalize(featuresT) # the input array is scaled to the norm between -1 and 1
-                        elif scale == "mean" :
-                            featuresT = sklearn.preprocessing.scale(featuresT, with_std=False) # center to the mean
-                        elif scale == "unit_var" :
-                            featuresT = sklearn.preprocessing.scale(featuresT, with_mean=False) # component-wise scale to unit variance
-                        elif scale == "all" :
-                            featuresT = sklearn.preprocessing.scale(featuresT) # center to the mean and component-wise scale to unit variance
-                        featureS = torch.Tensor(featuresT)
-                        if char_level :
-                            audio_dummy = "a" * (featuresT.shape[0] - 2) # generate a line with <unk> of given size
-                            conv_dummy = "a" * int(round(round(featuresT.shape[0]/2)/2) - 2)
-                        else :
-                            audio_dummy = "a " * (featuresT.shape[0] - 2) # generate a line with <unk> of given size
-                            conv_dummy = "a " * int(round(round(featuresT.shape[0]/2)/2) - 2)
-                        if train :
-                            length_ratio = featuresT.shape[0] // (len(text_line) + 1)
-                            if length_ratio < check :
-                                examples.append(data.Example.fromlist([text_line, featureS, audio_dummy, conv_dummy], all_fields))
-                            if length_ratio > maxi:
-                                maxi = length_ratio
-                            if length_ratio < mini:
-                                mini = length_ratio
-                            summa += length_ratio
-                            count += 1
-                        else:
-                            examples.append(data.Example.fromlist([text_line, featureS, audio_dummy, conv_dummy], all_fields))
-                    else : 
-                        warnings.warn('There is an empty text line or audio file.')
-                        print("Check the text line: ", text_line, " or audio file: ", audio_line)
-        if train :
-            length_info.write('mini={0}, maxi={1}, mean={2}, checked by {3} \n'.format(mini, maxi, summa/count, check))
-            length_info.close()
+            with open(log_path, 'a', buffering=1 << 20) as length_info:
+                length_info.write('mini={0}, maxi={1}, mean={2}, checked by {3} \n'.format(mini, maxi, summa/count, check))
         super(TranslationDataset, self).__init__(examples, all_fields, **kwargs)
 
     def __len__(self):
@@ -372,7 +564,8 @@ class AudioDataset(TranslationDataset):
         return self.examples[index].trg
 
     def getaudio(self, index):
-        return self.examples[index].audio
+        return self.fields['mfcc'].postprocessing(
+            [self.examples[index].mfcc])[0]
 
 
 class MonoAudioDataset(TranslationDataset):
@@ -382,39 +575,45 @@ class MonoAudioDataset(TranslationDataset):
     def sort_key(ex):
         return len(ex.src)
 
-    def __init__(self, path: str, audio_ext: str, field: Field, num: int, char_level: bool, **kwargs) -> None:
+    def __init__(self, path: str, audio_ext: str, field: Field, num: int, char_level: bool,
+            backend: str = "librosa", device: str = "cpu", dtype: str = "float32",
+            sample_rate: Optional[int] = None, num_workers: Optional[int] = None,
+            cache: bool = True, cache_dir: Optional[str] = None,
+            pin_features: bool = False, **kwargs) -> None:
         """
         Create a MonoAudioDataset (=only sources) given path.
 
+        Like for the AudioDataset, the mfccs are read from a memory-mapped
+        cache, the examples only hold their (start, length) in this cache
+        (or the path to their audio file without cache).
+
             :param path: Prefix of path to the data file
             :param audio_ext: Containing the extension to path for audio file
             :param field: Containing the field for dummy audio data
             :param num: Containing the number of mfccs to extract (= dimension of source embeddings)
             :param char_level: Containing the indicator for char level
+            :param backend: Containing the library for the feature extraction ("librosa" or "torchaudio")
+            :param device: Containing the device for the torchaudio feature extraction
+            :param dtype: Containing the storage type of the cached features (e.g. "float16")
+            :param sample_rate: Containing the sample rate to resample the audio to (None: native rate)
+            :param num_workers: Containing the number of processes for the librosa feature extraction (None: number of CPUs)
+            :param cache: Containing the indicator for the feature cache, otherwise the features are extracted per batch
+            :param cache_dir: Containing the directory of the feature cache (None: next to the audio file list)
+            :param pin_features: Containing the indicator for loading the cached features into one pinned tensor (CUDA only, for batches built in the main process)
             :param kwargs: Passed to the constructor of data.Dataset.
         """
-        audio_field = data.RawField()
+        self.features, audio_field, audio_entries = audio_field_entries(
+            path, audio_ext, num, "mfcc", False, "mono", backend, device,
+            dtype, sample_rate, num_workers, cache, pin_features, cache_dir)
         fields = [('mfcc', audio_field), ('src', field), ('conv', field)]
-        audio_path = os.path.expanduser(path + audio_ext)
-        examples = []
-
-        with open(audio_path) as audio_file:
-            for audio_line in audio_file:
-                audio_line = audio_line.strip()
-                if audio_line != '' and os.path.getsize(audio_line) > 44 :
-                    y, sr = librosa.load(audio_line, sr=None)
-                    features = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=num, n_fft=int(sr/40), hop_length=int(sr/100), n_mels=80)
-                    featuresT = features.T
-                    # normalize coefficients column-wise for each example 
-                    featuresNorm = librosa.util.normalize(featuresT) * 0.01
-                    featureS = torch.Tensor(featuresNorm)
-                    if char_level :
-                        audio_dummy = "a" * (featuresT.shape[0] - 2) # generate a line with <unk> of given size
-                        conv_dummy = "a" * int(round(round(featuresT.shape[0]/2)/2) - 2)
-                    else :
-                        audio_dummy = "a " * (featuresT.shape[0] - 2) # generate a line with <unk> of given size
-                        conv_dummy = "a " * int(round(round(featuresT.shape[0]/2)/2) - 2)
-                    examples.append(data.Example.fromlist([featureS, audio_dummy, conv_dummy], fields))
+        # the dummy src/conv lines are set directly, they don't need tokenization
+        example_fields = fields[:1]
+        from_list = data.Example.fromlist
+        examples = [_set_dummy_lines(from_list([audio], example_fields), length)
+                    for audio, length in audio_entries if length > 0]
+        # source lengths for bucketing (= length of the dummy src lines)
+        self.lengths = np.array([max(length - 2, 0) for _, length in audio_entries if length > 0],
+                                dtype=np.int32)
         super(TranslationDataset, self).__init__(examples, fields, **kwargs)
 
     def __len__(self):
@@ -3,15 +3,17 @@
 Collection of helper functions
 """
 import copy
-import glob
 import os
 import os.path
 import errno
+import inspect
 import shutil
 import random
 import logging
+import zipfile
+from functools import lru_cache
 from logging import Logger
-from typing import Callable, Optional, List
+from typing import Callable, Optional, List, Union
 import numpy as np
 import yaml
 
@@ -23,7 +25,13 @@ from torchtext.data import Dataset
 from tensorboardX import SummaryWriter
 
 from joeynmt.vocabulary import Vocabulary
-from joeynmt.plotting import plot_heatmap
+
+# the libyaml parser is much faster, it is only available if pyyaml was built
+# against libyaml
+try:
+    from yaml import CSafeLoader as _YAMLLoader
+except ImportError:
+    from yaml import SafeLoader as _YAMLLoader
 
 
 class ConfigurationError(Exception):
@@ -89,28 +97,48 @@ def log_cfg(cfg: dict, logger: Logger, prefix: str = "cfg") -> None:
             logger.info("{:34s} : {}".format(p, v))
 
 
-def clones(module: nn.Module, n: int) -> nn.ModuleList:
+def clones(module: Union[nn.Module, Callable[[], nn.Module]], n: int) \
+        -> nn.ModuleList:
     """
     Produce N identical layers. Transformer helper function.
 
-    :param module: the module to clone
+    Given a factory (e.g. `lambda: EncoderLayer(...)`), N fresh layers are
+    constructed, which is cheaper than deep-copying a module N times.
+
+    :param module: the module to clone or a factory creating it
     :param n: clone this many times
     :return cloned modules
     """
-    return nn.ModuleList([copy.deepcopy(module) for _ in range(n)])
+    if isinstance(module, nn.Module):
+        return nn.ModuleList([copy.deepcopy(module) for _ in range(n)])
+    return nn.ModuleList([module() for _ in range(n)])
 
 
-def subsequent_mask(size: int) -> Tensor:
+def subsequent_mask(size: int, device: Optional[torch.device] = None,
+                    dtype: torch.dtype = torch.bool) -> Tensor:
     """
     Mask out subsequent positions (to prevent attending to future positions)
     Transformer helper function.
 
-    :param size:
-    :return: Tensor with 0s and 1s
+    The mask is built directly on `device` and cached per
+    (size, device, dtype), so it must not be modified in place. Use
+    `.expand(batch_size, -1, -1)` for a batch dimension without a copy.
+
+    :param size: size of the mask (sequence length)
+    :param device: device to create the mask on, default: cpu
+    :param dtype: type of the mask, default: bool
+    :return: Tensor (1 x size x size) with True (1) on and below the
+        diagonal
     """
-    attn_shape = (1, size, size)
-    mask = np.triu(np.ones(attn_shape), k=1).astype('uint8')
-    return torch.from_numpy(mask) == 0
+    return _subsequent_mask(size, torch.device(device or "cpu"), dtype)
+
+
+@lru_cache(maxsize=128)
+def _subsequent_mask(size: int, device: torch.device, dtype: torch.dtype) \
+        -> Tensor:
+    """ Build the mask of `subsequent_mask`, cached by its arguments """
+    mask = torch.ones(size, size, dtype=dtype, device=device)
+    return mask.tril().unsqueeze(0)
 
 
 def set_seed(seed: int) -> None:
@@ -163,7 +191,7 @@ def load_config(path="configs/default.yaml") -> dict:
     :return: configuration dictionary
     """
     with open(path, 'r') as ymlfile:
-        cfg = yaml.safe_load(ymlfile)
+        cfg = yaml.load(ymlfile, Loader=_YAMLLoader)
     return cfg
 
 
@@ -194,6 +222,8 @@ def store_attention_plots(attentions: np.array, targets: List[List[str]],
     :param steps: current training steps, needed for tb_writer
     :param dpi: resolution for images
     """
+    # matplotlib is only imported when attention plots are stored
+    from joeynmt.plotting import plot_heatmap
     for i in indices:
         if i >= len(sources):
             continue
@@ -222,28 +252,55 @@ def store_attention_plots(attentions: np.array, targets: List[List[str]],
 def get_latest_checkpoint(ckpt_dir: str) -> Optional[str]:
     """
     Returns the latest checkpoint (by time) from the given directory.
-    If there is no checkpoint in this directory, returns None
+    If there is no checkpoint in this directory (or no such directory),
+    returns None
 
     :param ckpt_dir:
     :return: latest checkpoint file
     """
-    list_of_files = glob.glob("{}/*.ckpt".format(ckpt_dir))
     latest_checkpoint = None
-    if list_of_files:
-        latest_checkpoint = max(list_of_files, key=os.path.getctime)
+    latest_ctime = None
+    # one directory scan, the entries follow symlinks like getctime
+    try:
+        entries = os.scandir(ckpt_dir)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    with entries:
+        for entry in entries:
+            if entry.name.startswith(".") or not entry.name.endswith(".ckpt"):
+                continue
+            ctime = entry.stat().st_ctime
+            if latest_ctime is None or ctime > latest_ctime:
+                latest_checkpoint, latest_ctime = entry.path, ctime
     return latest_checkpoint
 
 
-def load_checkpoint(path: str, use_cuda: bool = True) -> dict:
+def load_checkpoint(path: str, use_cuda: bool = True,
+                    weights_only: bool = True) -> dict:
     """
     Load model from saved checkpoint.
 
+    Checkpoints in the zipfile format are memory-mapped, their tensors are
+    only read when they are used (needs torch>=2.1).
+
     :param path: path to checkpoint
     :param use_cuda: using cuda or not
+    :param weights_only: only unpickle tensors and primitive types
+        (torch>=1.13), set to False to load a trusted checkpoint with other
+        objects
     :return: checkpoint (dict)
     """
     assert os.path.isfile(path), "Checkpoint %s not found" % path
-    checkpoint = torch.load(path, map_location='cuda' if use_cuda else 'cpu')
+    map_location = 'cuda' if use_cuda else 'cpu'
+    # only the arguments this torch version knows, the legacy (non-zipfile)
+    # format can't be memory-mapped
+    load_args = inspect.signature(torch.load).parameters
+    load_kwargs = {}
+    if "weights_only" in load_args:
+        load_kwargs["weights_only"] = weights_only
+    if "mmap" in load_args and zipfile.is_zipfile(path):
+        load_kwargs["mmap"] = True
+    checkpoint = torch.load(path, map_location=map_location, **load_kwargs)
     return checkpoint
 
 
@@ -261,22 +318,15 @@ def tile(x: Tensor, count: int, dim=0) -> Tensor:
         h, c = x
         return tile(h, count, dim=dim), tile(c, count, dim=dim)
 
-    perm = list(range(len(x.size())))
-    if dim != 0:
-        perm[0], perm[dim] = perm[dim], perm[0]
-        x = x.permute(perm).contiguous()
+    # each entry along dim is repeated count times in a row:
+    # [b0, b1] -> [b0, b0, ..., b1, b1, ...]
+    # expand is a view, reshape copies the tiled tensor once
+    dim = dim % x.dim()
+    expanded_size = list(x.size())
+    expanded_size.insert(dim + 1, count)
     out_size = list(x.size())
-    out_size[0] *= count
-    batch = x.size(0)
-    x = x.view(batch, -1) \
-        .transpose(0, 1) \
-        .repeat(count, 1) \
-        .transpose(0, 1) \
-        .contiguous() \
-        .view(*out_size)
-    if dim != 0:
-        x = x.permute(perm).contiguous()
-    return x
+    out_size[dim] *= count
+    return x.unsqueeze(dim + 1).expand(*expanded_size).reshape(*out_size)
 
 
 def freeze_params(module: nn.Module) -> None:
@@ -286,8 +336,7 @@ def freeze_params(module: nn.Module) -> None:
 
     :param module: freeze parameters of this module
     """
-    for _, p in module.named_parameters():
-        p.requires_grad = False
+    module.requires_grad_(False)
 
 
 def symlink_update(target, link_name):
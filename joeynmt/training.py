@@ -28,7 +28,8 @@ from joeynmt.helpers import log_data_info, load_config, log_cfg, \
     store_attention_plots, load_checkpoint, make_model_dir, \
     make_logger, set_seed, symlink_update, ConfigurationError
 from joeynmt.prediction import validate_on_data
-from joeynmt.data import load_data, load_audio_data, make_data_iter
+from joeynmt.data import load_data, load_audio_data, make_data_iter, \
+    loader_workers
 from joeynmt.builders import build_optimizer, build_scheduler, \
     build_gradient_clipper
 
@@ -116,12 +117,16 @@ class TrainManager:
         self.epochs = train_config["epochs"]
         self.batch_size = train_config["batch_size"]
         self.batch_multiplier = train_config.get("batch_multiplier", 1)
+        self.num_workers = loader_workers(train_config.get("num_workers", 0))
+        self.prefetch_factor = train_config.get("prefetch_factor", 2)
+        self.persistent_workers = train_config.get("persistent_workers", True)
 
         # generation
         self.max_output_length = train_config.get("max_output_length", None)
 
         # CPU / GPU
         self.use_cuda = train_config["use_cuda"]
+        self.pin_memory = train_config.get("pin_memory", self.use_cuda)
         if self.use_cuda:
             self.model.cuda()
 
@@ -220,7 +225,11 @@ class TrainManager:
         """
             
         train_iter = make_data_iter(train_data, batch_size=self.batch_size,
-                                    train=True, shuffle=self.shuffle)
+                                    train=True, shuffle=self.shuffle,
+                                    num_workers=self.num_workers,
+                                    pin_memory=self.pin_memory,
+                                    prefetch_factor=self.prefetch_factor,
+                                    persistent_workers=self.persistent_workers)
         
         for epoch_no in range(self.epochs):
             self.logger.info("EPOCH %d", epoch_no + 1)
@@ -3,7 +3,10 @@
 """
 Vocabulary module
 """
+import heapq
 from collections import defaultdict, Counter
+from itertools import chain
+from operator import attrgetter
 from typing import List
 import numpy as np
 
@@ -34,6 +37,7 @@ class Vocabulary:
 
         self.stoi = defaultdict(DEFAULT_UNK_ID)
         self.itos = []
+        self._itos_arr = None
         if tokens is not None:
             self._from_list(tokens)
         elif file is not None:
@@ -101,6 +105,17 @@ class Vocabulary:
     def __len__(self) -> int:
         return len(self.itos)
 
+    def _itos_array(self) -> np.ndarray:
+        """
+        Object array of itos for vectorized lookups, rebuilt only when
+        tokens were added since the last call.
+
+        :return: 1D array of tokens
+        """
+        if self._itos_arr is None or len(self._itos_arr) != len(self.itos):
+            self._itos_arr = np.array(self.itos, dtype=object)
+        return self._itos_arr
+
     def array_to_sentence(self, array: np.array, cut_at_eos=True) -> List[str]:
         """
         Converts an array of IDs to a sentence, optionally cutting the result
@@ -110,13 +125,7 @@ class Vocabulary:
         :param cut_at_eos: cut the decoded sentences at the first <eos>
         :return: list of strings (tokens)
         """
-        sentence = []
-        for i in array:
-            s = self.itos[i]
-            if cut_at_eos and s == EOS_TOKEN:
-                break
-            sentence.append(s)
-        return sentence
+        return self.arrays_to_sentences([array], cut_at_eos=cut_at_eos)[0]
 
     def arrays_to_sentences(self, arrays: np.array, cut_at_eos=True) \
             -> List[List[str]]:
@@ -124,16 +133,33 @@ class Vocabulary:
         Convert multiple arrays containing sequences of token IDs to their
         sentences, optionally cutting them off at the end-of-sequence token.
 
-        :param arrays: 2D array containing indices
-        :param vocabulary: defines mapping of indices to tokens
+        All arrays are looked up at once, they may differ in length.
+
+        :param arrays: 2D array (or list of 1D arrays) containing indices
         :param cut_at_eos: cut the decoded sentences at the first <eos>
         :return: list of list of strings (tokens)
         """
-        sentences = []
-        for array in arrays:
-            sentences.append(
-                self.array_to_sentence(array=array, cut_at_eos=cut_at_eos))
-        return sentences
+        arrays = [np.asarray(array, dtype=np.int64).reshape(-1)
+                  for array in arrays]
+        if not arrays:
+            return []
+        indices = np.concatenate(arrays)
+        tokens = self._itos_array()[indices]
+        lengths = np.array([len(array) for array in arrays], dtype=np.int64)
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        if cut_at_eos:
+            # first <eos> at or after the start of each sentence
+            eos_positions = np.flatnonzero(
+                indices == self.stoi[EOS_TOKEN])
+            first = np.searchsorted(eos_positions, starts)
+            if len(eos_positions) > 0:
+                first_eos = eos_positions[
+                    np.minimum(first, len(eos_positions) - 1)]
+                ends = np.where((first < len(eos_positions))
+                                & (first_eos < ends), first_eos, ends)
+        return [tokens[start:end].tolist()
+                for start, end in zip(starts.tolist(), ends.tolist())]
 
 
 def build_vocab(field: str, max_size: int, min_freq: int, dataset: Dataset,
@@ -156,33 +182,23 @@ def build_vocab(field: str, max_size: int, min_freq: int, dataset: Dataset,
         vocab = Vocabulary(file=vocab_file)
     else:
         # create newly
-        def filter_min(counter: Counter, min_freq: int):
-            """ Filter counter by min frequency """
-            filtered_counter = Counter({t: c for t, c in counter.items()
-                                        if c >= min_freq})
-            return filtered_counter
-
-        def sort_and_cut(counter: Counter, limit: int):
-            """ Cut counter to most frequent,
+        def sort_and_cut(counter: Counter, limit: int, min_freq: int):
+            """ Cut counter to most frequent tokens with at least min_freq,
             sorted numerically and alphabetically"""
-            # sort by frequency, then alphabetically
-            tokens_and_frequencies = sorted(counter.items(),
-                                            key=lambda tup: tup[0])
-            tokens_and_frequencies.sort(key=lambda tup: tup[1], reverse=True)
-            vocab_tokens = [i[0] for i in tokens_and_frequencies[:limit]]
+            # select by frequency, then alphabetically, without sorting the
+            # whole counter
+            tokens_and_frequencies = heapq.nsmallest(
+                limit, ((t, c) for t, c in counter.items() if c >= min_freq),
+                key=lambda tup: (-tup[1], tup[0]))
+            vocab_tokens = [i[0] for i in tokens_and_frequencies]
             return vocab_tokens
 
-        tokens = []
-        for i in dataset.examples:
-            if field == "src":
-                tokens.extend(i.src)
-            elif field == "trg":
-                tokens.extend(i.trg)
-
-        counter = Counter(tokens)
-        if min_freq > -1:
-            counter = filter_min(counter, min_freq)
-        vocab_tokens = sort_and_cut(counter, max_size)
+        # count the tokens of the examples directly, without a token list
+        get_tokens = attrgetter(field)
+        counter = Counter(chain.from_iterable(
+            get_tokens(example) for example in dataset.examples))
+
+        vocab_tokens = sort_and_cut(counter, max_size, min_freq)
         assert len(vocab_tokens) <= max_size
 
         vocab = Vocabulary(tokens=vocab_tokens)
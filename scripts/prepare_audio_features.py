@@ -0,0 +1,62 @@
+# coding: utf-8
+"""
+Extract the audio features of the train, dev and test data of a speech
+configuration offline, so that training and testing start from the cache.
+"""
+import argparse
+import os
+
+from joeynmt.audio import prepare_audio_cache
+from joeynmt.helpers import load_config
+
+
+def prepare_features(cfg: dict, num_workers: int = None) -> None:
+    """
+    Build the feature caches with the same settings as `load_audio_data`.
+
+    :param cfg: configuration dictionary
+    :param num_workers: number of processes for the librosa extraction,
+        default: `feature_workers` of the data configuration
+    """
+    data_cfg = cfg["data"]
+    audio_lang = data_cfg["src"] if data_cfg["audio"] == "src" \
+        else data_cfg["trg"]
+    num = cfg["model"]["encoder"]["embeddings"]["embedding_dim"]
+    backend = data_cfg.get("feature_backend", "librosa")
+    device = "cuda" if cfg["training"].get("use_cuda", False) else "cpu"
+    dtype = data_cfg.get("feature_dtype", "float32")
+    sample_rate = data_cfg.get("sample_rate", None)
+    cache_dir = data_cfg.get("feature_cache_dir", None)
+    if num_workers is None:
+        num_workers = data_cfg.get("feature_workers", None)
+
+    paths = [data_cfg["train"], data_cfg["dev"]]
+    test_path = data_cfg.get("test", None)
+    if test_path is not None:
+        if os.path.isfile(test_path + "." + audio_lang):
+            paths.append(test_path)
+        else:
+            # MonoAudioDataset, fixed feature settings
+            prepare_audio_cache(test_path, ".txt", num, "mfcc", False, "mono",
+                                backend, device, num_workers=num_workers,
+                                dtype=dtype, sample_rate=sample_rate,
+                                cache_dir=cache_dir)
+    for path in paths:
+        features_path, _ = prepare_audio_cache(
+            path, ".txt", num, data_cfg["audio_features_level"],
+            data_cfg["use_htk"], data_cfg.get("scale", None), backend, device,
+            num_workers=num_workers, dtype=dtype, sample_rate=sample_rate,
+            cache_dir=cache_dir)
+        print("Features of {} cached in {}".format(path, features_path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("JoeyNMT audio feature extraction.")
+    parser.add_argument("config", type=str,
+                        help="Training configuration file (yaml).")
+    parser.add_argument("--num_workers", type=int, default=None,
+                        help="Number of processes. Default: feature_workers "
+                             "of the config or the number of CPUs")
+    args = parser.parse_args()
+
+    prepare_features(load_config(args.config), num_workers=args.num_workers)
@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+import unittest
+import wave
+from unittest import mock
+
+import numpy as np
+
+from joeynmt.audio import extract_audio_features_batch, prepare_audio_cache, \
+    _count_lines, _audio_frames
+
+try:
+    import torchaudio
+except ImportError:
+    torchaudio = None
+
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+try:
+    import librosa
+except ImportError:
+    librosa = None
+
+
+def write_wav(path, samples, sample_rate=16000):
+    """ Write mono 16 bit samples (floats in [-1, 1]) to a wav file """
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes((samples * 32767).astype("<i2").tobytes())
+
+
+class TestAudioFeatures(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        rng = np.random.RandomState(42)
+        time = np.arange(24000) / 16000
+        # a quiet short file and a loud long file
+        self.quiet = os.path.join(self.tmp_dir, "quiet.wav")
+        write_wav(self.quiet, 0.001 * np.sin(2 * np.pi * 440 * time[:8000])
+                  + 0.0005 * rng.uniform(-1, 1, 8000))
+        self.loud = os.path.join(self.tmp_dir, "loud.wav")
+        write_wav(self.loud, 0.8 * np.sin(2 * np.pi * 880 * time)
+                  + 0.1 * rng.uniform(-1, 1, 24000))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    @unittest.skipIf(torchaudio is None or librosa is None,
+                     "torchaudio or librosa is not installed")
+    def testFeaturesIndependentOfBatch(self):
+        for audio_level, num in [("mfcc", 40), ("mel_fb", 80)]:
+            alone = extract_audio_features_batch(
+                [self.quiet], num, audio_level, htk=False, scale=None)[0]
+            batched = extract_audio_features_batch(
+                [self.loud, self.quiet], num, audio_level, htk=False,
+                scale=None)
+            # 8000 samples, stride of 160 samples, centered frames
+            self.assertEqual(alone.shape, (8000 // 160 + 1, num))
+            self.assertEqual(batched[1].shape, alone.shape)
+            self.assertEqual(batched[0].shape, (24000 // 160 + 1, num))
+            if audio_level == "mel_fb":
+                # the energies of the quiet file are tiny, compare in dB
+                batched[1], alone = [10 * np.log10(np.maximum(features, 1e-10))
+                                     for features in (batched[1], alone)]
+            np.testing.assert_allclose(batched[1], alone, rtol=1e-4,
+                                       atol=1e-3)
+
+    @unittest.skipIf(soundfile is None, "soundfile is not installed")
+    def testAudioFrames(self):
+        # frame counts of the extracted features, from the header only
+        self.assertEqual(_audio_frames(self.quiet), 8000 // 160 + 1)
+        self.assertEqual(_audio_frames(self.loud, sample_rate=8000),
+                         12000 // 80 + 1)
+
+
+def fake_features(audio_lines, num, *args, **kwargs):
+    """ Features of a line: one frame per character, filled with its length """
+    for audio_line in audio_lines:
+        if audio_line == "":
+            yield None
+        else:
+            yield np.full((len(audio_line), num), len(audio_line),
+                          dtype=np.float32)
+
+
+class TestAudioCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "train")
+        # a repeated file and an empty line
+        with open(self.path + ".txt", "w") as audio_file:
+            audio_file.write("a.wav\nbb.wav\na.wav\n\nccc.wav\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def testCountLines(self):
+        count_path = os.path.join(self.tmp_dir, "count.txt")
+        for content, lines in [("", 0), ("a", 1), ("a\n", 1), ("a\nb", 2),
+                               ("a\n\nb\n", 3)]:
+            with open(count_path, "w") as count_file:
+                count_file.write(content)
+            self.assertEqual(_count_lines(count_path), lines)
+
+    def testPrepareAudioCache(self):
+        num = 3
+        cache_dir = os.path.join(self.tmp_dir, "cache")
+        with mock.patch("joeynmt.audio._iter_audio_features",
+                        side_effect=fake_features) as extractor:
+            features_path, offsets_path = prepare_audio_cache(
+                self.path, ".txt", num, "mfcc", False, None, dtype="float16",
+                cache_dir=cache_dir)
+            self.assertEqual(extractor.call_count, 1)
+            # repeated files are only extracted once
+            self.assertEqual(list(extractor.call_args[0][0]),
+                             ["a.wav", "bb.wav", "", "ccc.wav"])
+            self.assertEqual(os.path.dirname(features_path), cache_dir)
+            # no temporary file is left
+            self.assertEqual(sorted(os.listdir(cache_dir)),
+                             sorted([os.path.basename(features_path),
+                                     os.path.basename(offsets_path)]))
+
+            features = np.load(features_path, mmap_mode="r")
+            offsets = np.load(offsets_path)
+            self.assertEqual(features.dtype, np.float16)
+            self.assertEqual(features.shape, (5 + 6 + 7, num))
+            np.testing.assert_array_equal(
+                offsets, [[0, 5], [5, 6], [0, 5], [11, 0], [11, 7]])
+            for (start, length), line in zip(
+                    offsets, ["a.wav", "bb.wav", "a.wav", "", "ccc.wav"]):
+                np.testing.assert_array_equal(
+                    features[start:start + length],
+                    np.full((len(line), num), len(line)))
+
+            # the cache is reused
+            self.assertEqual(prepare_audio_cache(
+                self.path, ".txt", num, "mfcc", False, None, dtype="float16",
+                cache_dir=cache_dir), (features_path, offsets_path))
+            self.assertEqual(extractor.call_count, 1)
@@ -1,10 +1,13 @@
 import torch
 import random
+import unittest
 
 from torchtext.data.batch import Batch as TorchTBatch
+from torchtext.data.iterator import pool
+from torchtext.data.utils import RandomShuffler
 
 from joeynmt.batch import Batch
-from joeynmt.data import load_data, make_data_iter
+from joeynmt.data import load_data, make_data_iter, LenBucketSampler
 from joeynmt.constants import PAD_TOKEN
 from .test_helpers import TensorTestCase
 
@@ -41,11 +44,8 @@ class TestData(TensorTestCase):
         # make data iterator
         train_iter = make_data_iter(self.train_data, train=True, shuffle=True,
                                     batch_size=batch_size)
-        self.assertEqual(train_iter.batch_size, batch_size)
-        self.assertTrue(train_iter.shuffle)
-        self.assertTrue(train_iter.train)
-        self.assertEqual(train_iter.epoch, 0)
-        self.assertEqual(train_iter.iterations, 0)
+        self.assertEqual(train_iter.batch_sampler.batch_size, batch_size)
+        self.assertTrue(train_iter.batch_sampler.shuffle)
 
         expected_src0 = torch.Tensor(
             [[21, 10, 4, 16, 4, 5, 21, 4, 12, 33, 6, 14, 4, 12, 23, 6, 18, 4,
@@ -85,10 +85,6 @@ class TestData(TensorTestCase):
         dev_iter = make_data_iter(self.dev_data, train=False, shuffle=False,
                                   batch_size=batch_size)
         self.assertEqual(dev_iter.batch_size, batch_size)
-        self.assertFalse(dev_iter.shuffle)
-        self.assertFalse(dev_iter.train)
-        self.assertEqual(dev_iter.epoch, 0)
-        self.assertEqual(dev_iter.iterations, 0)
 
         expected_src0 = torch.Tensor(
             [[29, 8, 5, 22, 5, 8, 16, 7, 19, 5, 22, 5, 24, 8, 7, 5, 7, 19,
@@ -112,7 +108,7 @@ class TestData(TensorTestCase):
 
         total_samples = 0
         for b in iter(dev_iter):
-            self.assertEqual(type(b), TorchTBatch)
+            self.assertIsInstance(b, TorchTBatch)
             b = Batch(b, pad_index=self.pad_index)
 
             # test the sorting by src length
@@ -134,3 +130,66 @@ class TestData(TensorTestCase):
         self.assertEqual(total_samples, len(self.dev_data))
 
 
+class LengthDataset:
+    """ Dataset that only provides the source lengths, like audio datasets """
+
+    def __init__(self, lengths):
+        self.lengths = lengths
+
+
+class TestLenBucketSampler(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        # many ties, 3 pools of 100 batches (the last one incomplete)
+        self.lengths = [rng.randint(1, 20) for _ in range(450)]
+        self.batch_size = 2
+        self.dataset = LengthDataset(self.lengths)
+
+    def testNoShuffle(self):
+        sampler = LenBucketSampler(self.dataset, self.batch_size,
+                                   shuffle=False)
+        batches = list(sampler)
+        self.assertEqual(len(batches), len(sampler))
+        self.assertEqual(sorted(i for batch in batches for i in batch),
+                         list(range(len(self.lengths))))
+        pool_batches = 100
+        for pool_start in range(0, len(batches), pool_batches):
+            pool_lengths = [[self.lengths[i] for i in batch] for batch in
+                            batches[pool_start:pool_start + pool_batches]]
+            for batch_lengths in pool_lengths:
+                # decreasing length within a batch
+                self.assertEqual(batch_lengths,
+                                 sorted(batch_lengths, reverse=True))
+            # increasing length over the batches of a sorted pool
+            for previous, batch_lengths in zip(pool_lengths,
+                                               pool_lengths[1:]):
+                self.assertLessEqual(max(previous), min(batch_lengths))
+
+    def testShuffleLikeBucketIterator(self):
+        random.seed(42)
+        shuffler = RandomShuffler()
+        random.seed(42)
+        sampler = LenBucketSampler(self.dataset, self.batch_size,
+                                   shuffle=True)
+        for _ in range(2):
+            # BucketIterator with sort_within_batch=True
+            expected = [
+                sorted(batch, key=lambda i: self.lengths[i], reverse=True)
+                for batch in pool(shuffler(range(len(self.lengths))),
+                                  self.batch_size,
+                                  key=lambda i: self.lengths[i],
+                                  random_shuffler=shuffler, shuffle=True,
+                                  sort_within_batch=True)]
+            self.assertEqual(list(sampler), expected)
+
+    def testSameSeedSameBatches(self):
+        epochs = []
+        for _ in range(2):
+            random.seed(42)
+            sampler = LenBucketSampler(self.dataset, self.batch_size,
+                                       shuffle=True)
+            epochs.append([list(sampler), list(sampler)])
+        self.assertEqual(epochs[0], epochs[1])
+        # but different batches in the next epoch
+        self.assertNotEqual(epochs[0][0], epochs[0][1])
@@ -1,6 +1,9 @@
 import unittest
+import warnings
+from unittest import mock
 
-from joeynmt.data import MonoDataset, TranslationDataset, load_data
+from joeynmt.data import MonoDataset, TranslationDataset, load_data, \
+    loader_workers
 
 
 class TestData(unittest.TestCase):
@@ -110,4 +113,17 @@ class TestData(unittest.TestCase):
                             comparison_src = expected_srcs[level].split()
                             comparison_trg = expected_trgs[level].split()
                     self.assertEqual(train_data.examples[0].src, comparison_src)
-                    self.assertEqual(train_data.examples[0].trg, comparison_trg)
\ No newline at end of file
+                    self.assertEqual(train_data.examples[0].trg, comparison_trg)
+
+    def testLoaderWorkers(self):
+        self.assertEqual(loader_workers(0), 0)
+        with mock.patch("multiprocessing.get_start_method",
+                        return_value="fork"):
+            self.assertEqual(loader_workers(2), 2)
+        # spawned workers can't receive the datasets
+        with mock.patch("multiprocessing.get_start_method",
+                        return_value="spawn"):
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                self.assertEqual(loader_workers(2), 0)
+            self.assertEqual(len(caught), 1)
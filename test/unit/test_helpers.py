@@ -1,6 +1,13 @@
+import os
+import shutil
+import tempfile
 import unittest
 
 import torch
+from torch import nn
+
+from joeynmt.helpers import tile, get_latest_checkpoint, subsequent_mask, \
+    clones
 
 
 class TensorTestCase(unittest.TestCase):
@@ -22,3 +29,116 @@ class TensorTestCase(unittest.TestCase):
         if not diff:
             self.fail("Tensors didn't match but were supposed to {} vs"
                       " {}".format(expected, actual))
+
+
+def permute_tile(x, count, dim=0):
+    """ Former permute/repeat implementation of `tile` (from OpenNMT) """
+    perm = list(range(len(x.size())))
+    if dim != 0:
+        perm[0], perm[dim] = perm[dim], perm[0]
+        x = x.permute(perm).contiguous()
+    out_size = list(x.size())
+    out_size[0] *= count
+    batch = x.size(0)
+    x = x.view(batch, -1) \
+        .transpose(0, 1) \
+        .repeat(count, 1) \
+        .transpose(0, 1) \
+        .contiguous() \
+        .view(*out_size)
+    if dim != 0:
+        x = x.permute(perm).contiguous()
+    return x
+
+
+class TestTile(TensorTestCase):
+
+    def setUp(self):
+        seed = 42
+        torch.manual_seed(seed)
+        # batch x time x hidden
+        self.x = torch.rand(3, 4, 5)
+        self.count = 2
+
+    def testTile(self):
+        for dim in [0, 1, 2, -1, -2]:
+            tiled = tile(self.x, self.count, dim=dim)
+            expected = permute_tile(self.x, self.count, dim=dim)
+            self.assertEqual(tiled.size(), expected.size())
+            self.assertTensorEqual(expected, tiled)
+
+    def testTileTuple(self):
+        # (hidden, cell) of a LSTM: layers x batch x hidden
+        h, c = torch.rand(2, 3, 5), torch.rand(2, 3, 5)
+        tiled_h, tiled_c = tile((h, c), self.count, dim=1)
+        self.assertTensorEqual(permute_tile(h, self.count, dim=1), tiled_h)
+        self.assertTensorEqual(permute_tile(c, self.count, dim=1), tiled_c)
+
+
+class TestLatestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def testNoCheckpoint(self):
+        self.assertIsNone(get_latest_checkpoint(self.tmp_dir))
+        self.assertIsNone(get_latest_checkpoint(
+            os.path.join(self.tmp_dir, "missing")))
+
+    def testCheckpoint(self):
+        for name in ["100.ckpt", ".hidden.ckpt", "validations.txt"]:
+            open(os.path.join(self.tmp_dir, name), "w").close()
+        self.assertEqual(get_latest_checkpoint(self.tmp_dir),
+                         os.path.join(self.tmp_dir, "100.ckpt"))
+
+
+class TestSubsequentMask(TensorTestCase):
+
+    def testMask(self):
+        mask = subsequent_mask(4)
+        self.assertEqual(mask.size(), (1, 4, 4))
+        self.assertEqual(mask.dtype, torch.bool)
+        expected = torch.tensor([[[True, False, False, False],
+                                  [True, True, False, False],
+                                  [True, True, True, False],
+                                  [True, True, True, True]]])
+        self.assertTensorEqual(expected, mask)
+        mask = subsequent_mask(4, dtype=torch.uint8)
+        self.assertEqual(mask.dtype, torch.uint8)
+        self.assertTensorEqual(expected.to(torch.uint8), mask)
+
+    def testCache(self):
+        # the same cached tensor for all ways to name the cpu
+        mask = subsequent_mask(6)
+        self.assertIs(subsequent_mask(6, "cpu"), mask)
+        self.assertIs(subsequent_mask(6, torch.device("cpu")), mask)
+        self.assertIsNot(subsequent_mask(6, dtype=torch.uint8), mask)
+        self.assertIsNot(subsequent_mask(7), mask)
+
+
+class TestClones(unittest.TestCase):
+
+    def testFactory(self):
+        layers = clones(lambda: nn.Linear(3, 3), 2)
+        self.assertIsInstance(layers, nn.ModuleList)
+        self.assertEqual(len(layers), 2)
+        self.assertIsNot(layers[0].weight, layers[1].weight)
+        # independent parameters
+        with torch.no_grad():
+            layers[0].weight.fill_(1.)
+        self.assertFalse(torch.equal(layers[0].weight, layers[1].weight))
+        self.assertEqual(len(list(layers.parameters())), 4)
+
+    def testModule(self):
+        layer = nn.Linear(3, 3)
+        layers = clones(layer, 2)
+        self.assertEqual(len(layers), 2)
+        for clone in layers:
+            self.assertIsNot(clone, layer)
+            self.assertTrue(torch.equal(clone.weight, layer.weight))
+        with torch.no_grad():
+            layers[0].weight.fill_(1.)
+        self.assertFalse(torch.equal(layers[0].weight, layers[1].weight))
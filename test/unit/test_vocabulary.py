@@ -51,3 +51,17 @@ class TestVocabulary(unittest.TestCase):
         self.assertFalse(self.word_vocab.is_unk("Die"))
         self.assertTrue(self.char_vocab.is_unk("x"))
         self.assertFalse(self.char_vocab.is_unk("d"))
+
+    def testArraysToSentences(self):
+        eos = self.word_vocab.stoi["</s>"]
+        die = self.word_vocab.stoi["Die"]
+        meer = self.word_vocab.stoi["Meer"]
+        # rows of different length, <eos> in the middle, at the end, none
+        arrays = [[die, meer, eos, die], [meer, eos], [die, die], []]
+        self.assertEqual(self.word_vocab.arrays_to_sentences(arrays),
+                         [["Die", "Meer"], ["Meer"], ["Die", "Die"], []])
+        self.assertEqual(
+            self.word_vocab.arrays_to_sentences(arrays, cut_at_eos=False),
+            [["Die", "Meer", "</s>", "Die"], ["Meer", "</s>"],
+             ["Die", "Die"], []])
+        self.assertEqual(self.word_vocab.array_to_sentence([eos, die]), [])